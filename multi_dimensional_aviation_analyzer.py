@@ -12,6 +12,8 @@ from shapely.geometry import Point, LineString, Polygon
 import sqlite3
 import psycopg2
 from datetime import datetime, timedelta
+import matplotlib
+matplotlib.use('Agg')  # Batch rendering to files, no GUI backend
 import matplotlib.pyplot as plt
 import seaborn as sns
 import folium
@@ -21,9 +23,15 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import contextily as ctx
 from typing import Dict, List, Tuple, Optional
+import logging
 import warnings
 warnings.filterwarnings('ignore')
 
+plt.rcParams['path.simplify'] = True
+plt.rcParams['path.simplify_threshold'] = 1.0
+
+log = logging.getLogger(__name__)
+
 # Import our custom modules
 from maq_weather_integrator import MAQWeatherIntegrator
 from geopandas_trajectory_analysis import FlightTrajectoryAnalyzer
@@ -59,8 +67,10 @@ class MultiDimensionalAviationAnalyzer:
         
         # Define Amsterdam Noord analysis zones
         self.analysis_zones = self._create_enhanced_analysis_zones()
+        # Zones are static, so serialize them to GeoJSON once for map rendering
+        self._zones_geojson = self.analysis_zones.to_json()
         
-        print("✅ Multi-dimensional analyzer initialized")
+        log.info("✅ Multi-dimensional analyzer initialized")
         
     def _create_enhanced_analysis_zones(self) -> gpd.GeoDataFrame:
         """Create detailed analysis zones for environmental justice analysis"""
@@ -204,17 +214,17 @@ class MultiDimensionalAviationAnalyzer:
             demographic_df['geometry'] = demographic_df['geometry_wkt'].apply(wkt.loads)
             demographic_gdf = gpd.GeoDataFrame(demographic_df, crs='EPSG:4326')
             
-            print(f"✅ Loaded {len(demographic_gdf)} demographic zones")
+            log.info("✅ Loaded %d demographic zones", len(demographic_gdf))
             return demographic_gdf
             
         except Exception as e:
-            print(f"❌ Error loading demographic data: {e}")
+            log.error("❌ Error loading demographic data: %s", e)
             return self._create_synthetic_demographic_data()
     
     def _create_synthetic_demographic_data(self) -> gpd.GeoDataFrame:
         """Create synthetic demographic data for testing"""
         
-        print("📊 Creating synthetic demographic data for analysis")
+        log.info("📊 Creating synthetic demographic data for analysis")
         
         # Create grid of demographic zones over Amsterdam Noord
         np.random.seed(42)
@@ -273,7 +283,7 @@ class MultiDimensionalAviationAnalyzer:
     def perform_comprehensive_analysis(self, time_window: str = '24 hours') -> Dict:
         """Perform comprehensive multi-dimensional analysis"""
         
-        print(f"\n🔍 Starting comprehensive analysis for {time_window}")
+        log.info("🔍 Starting comprehensive analysis for %s", time_window)
         
         results = {
             'analysis_timestamp': datetime.now(),
@@ -281,29 +291,39 @@ class MultiDimensionalAviationAnalyzer:
         }
         
         # 1. Load and analyze flight trajectories
-        print("1. Analyzing flight trajectories...")
+        log.info("1. Analyzing flight trajectories...")
         flight_points = self.flight_analyzer.load_flight_points(time_window)
+
+        # Without flight points every downstream phase is a no-op; skip the
+        # MAQ API call and the PostGIS demographic load entirely
+        if len(flight_points) == 0:
+            log.info("No flight data for %s - skipping remaining analysis", time_window)
+            results['flight_analysis'] = {
+                'total_points': 0,
+                'total_trajectories': 0,
+                'unique_aircraft': 0
+            }
+            for section in ('weather_analysis', 'demographic_analysis',
+                            'environmental_justice', 'spatial_analysis'):
+                results[section] = {'note': 'No flight data'}
+            return results
+
         trajectories = self.flight_analyzer.create_trajectories(flight_points)
-        
+
         results['flight_analysis'] = {
             'total_points': len(flight_points),
             'total_trajectories': len(trajectories),
-            'unique_aircraft': flight_points['icao24'].nunique() if len(flight_points) > 0 else 0
+            'unique_aircraft': flight_points['icao24'].nunique()
         }
-        
+
         # 2. Integrate weather data
-        print("2. Integrating weather patterns...")
+        log.info("2. Integrating weather patterns...")
         end_date = datetime.now()
         start_date = end_date - timedelta(hours=24)
         
         weather_data = self.weather_integrator.retrieve_weather_data('240', start_date, end_date)
         
-        if len(flight_points) > 0 and len(weather_data) > 0:
-            # Convert flight points to DataFrame for weather correlation
-            flight_df = pd.DataFrame(flight_points.drop(columns=['geometry']))
-            flight_df['latitude'] = flight_points.geometry.y
-            flight_df['longitude'] = flight_points.geometry.x
-            
+        if len(weather_data) > 0:
             correlated_data = self.weather_integrator.correlate_weather_flight_data(
                 self.flight_db_path, weather_data
             )
@@ -316,7 +336,7 @@ class MultiDimensionalAviationAnalyzer:
             results['weather_analysis'] = {'note': 'No data available for correlation'}
         
         # 3. Load demographic data
-        print("3. Loading demographic data...")
+        log.info("3. Loading demographic data...")
         demographic_data = self.load_demographic_data()
         
         results['demographic_analysis'] = {
@@ -329,7 +349,7 @@ class MultiDimensionalAviationAnalyzer:
         }
         
         # 4. Environmental justice analysis
-        print("4. Performing environmental justice analysis...")
+        log.info("4. Performing environmental justice analysis...")
         if len(trajectories) > 0 and len(demographic_data) > 0:
             environmental_justice = self._analyze_environmental_justice(
                 trajectories, demographic_data, correlated_data
@@ -339,7 +359,7 @@ class MultiDimensionalAviationAnalyzer:
             results['environmental_justice'] = {'note': 'Insufficient data for analysis'}
         
         # 5. Spatial correlation analysis
-        print("5. Analyzing spatial correlations...")
+        log.info("5. Analyzing spatial correlations...")
         if len(trajectories) > 0 and len(demographic_data) > 0:
             spatial_analysis = self._perform_spatial_correlation_analysis(
                 trajectories, demographic_data
@@ -348,7 +368,7 @@ class MultiDimensionalAviationAnalyzer:
         else:
             results['spatial_analysis'] = {'note': 'Insufficient data for analysis'}
         
-        print("✅ Comprehensive analysis completed")
+        log.info("✅ Comprehensive analysis completed")
         return results
     
     def _analyze_environmental_justice(self, trajectories_gdf: gpd.GeoDataFrame,
@@ -368,19 +388,10 @@ class MultiDimensionalAviationAnalyzer:
             
             # Income-based noise exposure analysis
             if 'gemiddeld_inkomen' in trajectory_demographics.columns:
-                # Create income quartiles
-                income_quartiles = pd.qcut(
-                    trajectory_demographics['gemiddeld_inkomen'].dropna(), 
-                    q=4, labels=['Low', 'Medium-Low', 'Medium-High', 'High']
+                analysis['noise_by_income_quartile'] = self._noise_by_income_quartile(
+                    trajectory_demographics
                 )
                 
-                noise_by_income = trajectory_demographics.groupby(income_quartiles).agg({
-                    'max_noise_db': ['mean', 'max', 'count'],
-                    'min_distance_noord': 'mean'
-                }).round(2)
-                
-                analysis['noise_by_income_quartile'] = noise_by_income.to_dict()
-                
                 # Statistical test for environmental justice
                 from scipy.stats import pearsonr
                 income_noise_corr = pearsonr(
@@ -398,21 +409,26 @@ class MultiDimensionalAviationAnalyzer:
             
             # Demographic composition analysis
             demographic_impacts = {}
+            max_noise = trajectory_demographics['max_noise_db'].to_numpy(dtype=float)
             
             for demo_var in ['percentage_niet_westers', 'percentage_65_plus', 'percentage_laag_inkomen']:
                 if demo_var in trajectory_demographics.columns:
-                    high_demo = trajectory_demographics[
-                        trajectory_demographics[demo_var] > trajectory_demographics[demo_var].median()
-                    ]
-                    low_demo = trajectory_demographics[
-                        trajectory_demographics[demo_var] <= trajectory_demographics[demo_var].median()
-                    ]
+                    # Split on one boolean mask over numpy arrays, no frame copies
+                    vals = trajectory_demographics[demo_var].to_numpy(dtype=float)
+                    valid = ~np.isnan(vals) & ~np.isnan(max_noise)
+                    vals, noise = vals[valid], max_noise[valid]
+                    if len(vals) == 0:
+                        continue
                     
-                    if len(high_demo) > 0 and len(low_demo) > 0:
+                    hi = vals > np.median(vals)
+                    
+                    if hi.any() and not hi.all():
+                        hi_mean = noise[hi].mean()
+                        lo_mean = noise[~hi].mean()
                         demographic_impacts[demo_var] = {
-                            'high_group_avg_noise': high_demo['max_noise_db'].mean(),
-                            'low_group_avg_noise': low_demo['max_noise_db'].mean(),
-                            'difference': high_demo['max_noise_db'].mean() - low_demo['max_noise_db'].mean()
+                            'high_group_avg_noise': hi_mean,
+                            'low_group_avg_noise': lo_mean,
+                            'difference': hi_mean - lo_mean
                         }
             
             analysis['demographic_impacts'] = demographic_impacts
@@ -440,6 +456,43 @@ class MultiDimensionalAviationAnalyzer:
         
         return analysis
     
+    def _noise_by_income_quartile(self, trajectory_demographics: pd.DataFrame) -> Dict:
+        """Aggregate noise exposure per income quartile with numpy bincount"""
+        
+        # Same output shape as groupby(qcut).agg({...}).round(2).to_dict()
+        labels = ['Low', 'Medium-Low', 'Medium-High', 'High']
+
+        income = trajectory_demographics['gemiddeld_inkomen'].to_numpy(dtype=float)
+        has_income = ~np.isnan(income)
+        codes = pd.qcut(income[has_income], q=4, labels=False)
+
+        noise = trajectory_demographics['max_noise_db'].to_numpy(dtype=float)[has_income]
+        distance = trajectory_demographics['min_distance_noord'].to_numpy(dtype=float)[has_income]
+
+        def grouped_mean(values: np.ndarray) -> np.ndarray:
+            valid = ~np.isnan(values)
+            sums = np.bincount(codes[valid], weights=values[valid], minlength=4)
+            counts = np.bincount(codes[valid], minlength=4)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return sums / counts
+
+        noise_valid = ~np.isnan(noise)
+        noise_count = np.bincount(codes[noise_valid], minlength=4)
+        noise_max = np.full(4, np.nan)
+        np.fmax.at(noise_max, codes, noise)
+
+        columns = {
+            ('max_noise_db', 'mean'): grouped_mean(noise).round(2),
+            ('max_noise_db', 'max'): noise_max.round(2),
+            ('max_noise_db', 'count'): noise_count,
+            ('min_distance_noord', 'mean'): grouped_mean(distance).round(2)
+        }
+
+        return {
+            column: {label: values[i].item() for i, label in enumerate(labels)}
+            for column, values in columns.items()
+        }
+
     def _perform_spatial_correlation_analysis(self, trajectories_gdf: gpd.GeoDataFrame, 
                                             demographic_gdf: gpd.GeoDataFrame) -> Dict:
         """Perform detailed spatial correlation analysis"""
@@ -491,7 +544,7 @@ class MultiDimensionalAviationAnalyzer:
                                           output_prefix: str = 'multi_dimensional'):
         """Create comprehensive visualizations for hackathon presentation"""
         
-        print("🎨 Creating comprehensive visualizations...")
+        log.info("🎨 Creating comprehensive visualizations...")
         
         # 1. Interactive map with all layers
         self._create_interactive_map(analysis_results, f'{output_prefix}_interactive_map.html')
@@ -502,7 +555,7 @@ class MultiDimensionalAviationAnalyzer:
         # 3. Environmental justice report
         self._create_environmental_justice_report(analysis_results, f'{output_prefix}_environmental_justice.png')
         
-        print(f"✅ All visualizations created with prefix: {output_prefix}")
+        log.info("✅ All visualizations created with prefix: %s", output_prefix)
     
     def _create_interactive_map(self, analysis_results: Dict, output_file: str):
         """Create comprehensive interactive map"""
@@ -537,7 +590,7 @@ class MultiDimensionalAviationAnalyzer:
                         popup=f"Income: €{zone['gemiddeld_inkomen']:,.0f}"
                     ).add_to(m)
         except:
-            print("Could not add demographic layer to map")
+            log.warning("Could not add demographic layer to map")
         
         # Add flight trajectories if available
         try:
@@ -556,25 +609,25 @@ class MultiDimensionalAviationAnalyzer:
                         popup=f"Noise: {traj['max_noise_db']:.0f} dB"
                     ).add_to(m)
         except:
-            print("Could not add flight trajectories to map")
-        
-        # Add analysis zones
-        for _, zone in self.analysis_zones.iterrows():
-            folium.GeoJson(
-                zone['geometry'],
-                style_function=lambda x: {
-                    'fillColor': 'blue' if 'noise' in x['properties']['zone_type'] else 'purple',
-                    'color': 'black',
-                    'weight': 1,
-                    'fillOpacity': 0.1
-                }
-            ).add_to(m)
+            log.warning("Could not add flight trajectories to map")
+        
+        # Add analysis zones as a single layer from the pre-serialized GeoJSON
+        folium.GeoJson(
+            self._zones_geojson,
+            name='Analysis Zones',
+            style_function=lambda feature: {
+                'fillColor': 'blue' if 'noise' in feature['properties']['zone_type'] else 'purple',
+                'color': 'black',
+                'weight': 1,
+                'fillOpacity': 0.1
+            }
+        ).add_to(m)
         
         # Add layer control
         folium.LayerControl().add_to(m)
         
         m.save(output_file)
-        print(f"✅ Interactive map saved: {output_file}")
+        log.info("✅ Interactive map saved: %s", output_file)
     
     def _create_statistical_dashboard(self, analysis_results: Dict, output_file: str):
         """Create statistical analysis dashboard"""
@@ -673,10 +726,10 @@ class MultiDimensionalAviationAnalyzer:
         ax6.axis('off')
         
         plt.tight_layout()
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
-        plt.show()
+        fig.savefig(output_file, dpi=150, bbox_inches='tight')
+        plt.close(fig)
         
-        print(f"✅ Statistical dashboard saved: {output_file}")
+        log.info("✅ Statistical dashboard saved: %s", output_file)
     
     def _create_environmental_justice_report(self, analysis_results: Dict, output_file: str):
         """Create focused environmental justice analysis visualization"""
@@ -757,10 +810,10 @@ class MultiDimensionalAviationAnalyzer:
             ax4.set_title('Noise Hotspot Demographics')
         
         plt.tight_layout()
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
-        plt.show()
+        fig.savefig(output_file, dpi=150, bbox_inches='tight')
+        plt.close(fig)
         
-        print(f"✅ Environmental justice report saved: {output_file}")
+        log.info("✅ Environmental justice report saved: %s", output_file)
 
 def main():
     """Demonstrate multi-dimensional aviation analysis"""
@@ -804,4 +857,5 @@ def main():
     return results
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     main()
\ No newline at end of file
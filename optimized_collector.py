@@ -8,15 +8,28 @@ import sqlite3
 import signal
 import sys
 import time
+import threading
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import os
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Import existing components
 from opensky_fetcher import OpenSkyFetcher
 from schiphol_analyzer import SchipholFlightAnalyzer
 
+# Same string object on every call, so sqlite3's statement cache always hits
+_INSERT_FLIGHT_SQL = '''
+    INSERT INTO flights (
+        collection_time, collection_type, icao24, callsign,
+        latitude, longitude, baro_altitude, velocity,
+        true_track, vertical_rate, distance_to_house_km,
+        estimated_noise_db, points_in_segment
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
 class OptimizedFlightCollector:
     """Maximizes trajectory quality within 4000 API calls/day"""
     
@@ -27,9 +40,21 @@ class OptimizedFlightCollector:
         
         # MAXIMIZE API USAGE STRATEGY
         self.DAILY_API_LIMIT = 3950  # Small buffer
+        # Share of the daily budget held back for OpenSky (see schedule below);
+        # Schiphol enrichment may only spend what is left above it
+        self.OPENSKY_DAILY_RESERVE = 2100
+        # _fetch_schiphol is a placeholder until a real Schiphol client exists;
+        # while it is, lookups make no HTTP request and are not charged
+        self.SCHIPHOL_LIVE = False
         self.api_calls_today = 0
         self.last_reset_date = datetime.now().date()
         
+        # API usage is written to SQLite in batches, not on every call
+        self.USAGE_FLUSH_SECONDS = 60
+        self.USAGE_FLUSH_CALLS = 32
+        self._pending_usage = {'opensky': 0, 'schiphol': 0, 'collections': 0}
+        self._last_usage_flush = time.monotonic()
+        
         # OPTIMIZED SCHEDULE - Based on current flight patterns
         # Peak: 06-20 hours = 15 hours, every 30s = 1800 calls
         # Off-peak: 21-23, 05 = 4 hours, every 60s = 240 calls  
@@ -64,13 +89,27 @@ class OptimizedFlightCollector:
             'coverage_area': {
                 'lat_min': 52.0, 'lat_max': 52.6,
                 'lon_min': 4.2, 'lon_max': 5.2
-            }
+            },
+            
+            'house_coords': (52.395, 4.915)  # Amsterdam Noord 1032 center
         }
         
+        # Hour of day -> schedule lookup table, built once
+        self._hour_to_schedule = [None] * 24
+        for schedule_name, schedule in self.collection_settings['schedules'].items():
+            for hour in schedule['hours']:
+                self._hour_to_schedule[hour] = {
+                    'name': schedule_name,
+                    'opensky_interval': schedule['opensky_interval'],
+                    'schiphol_interval': schedule['schiphol_interval'],
+                    'description': schedule['description']
+                }
+        
         # Smart Schiphol usage
+        self.AIRCRAFT_CACHE_SIZE = 5000  # Bounded so 14 days of callsigns don't accumulate
         self.schiphol_state = {
             'last_call': None,
-            'aircraft_cache': {},  # Cache aircraft info to reduce calls
+            'aircraft_cache': OrderedDict(),  # LRU cache of aircraft info to reduce calls
             'call_counter': 0
         }
         
@@ -78,16 +117,20 @@ class OptimizedFlightCollector:
         self.fetcher = None
         self.analyzer = SchipholFlightAnalyzer()
         self.running = False
+        self._stop_event = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=8)  # Schiphol lookups
         
         # Statistics
         self.stats = {
             'total_collections': 0,
             'opensky_calls': 0,
             'schiphol_calls': 0,
-            'flights_tracked': {},
+            'flights_tracked': Counter(),
             'last_collection': None,
             'start_time': self.start_time
         }
+        # Aircraft with >= 15 points, maintained incrementally as counts cross the threshold
+        self._high_quality_count = 0
         
         # Setup
         self.setup_logging()
@@ -129,7 +172,13 @@ class OptimizedFlightCollector:
         
     def setup_database(self):
         """Optimized database schema"""
-        conn = sqlite3.connect(self.db_path)
+        # Single long-lived connection, reused by every collection.
+        # Autocommit mode: transactions are opened explicitly around batches.
+        self._conn = sqlite3.connect(self.db_path, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA temp_store=MEMORY')
+        conn = self._conn
         
         # Flights table with trajectory optimization
         conn.execute('''
@@ -176,13 +225,9 @@ class OptimizedFlightCollector:
         conn.execute('CREATE INDEX IF NOT EXISTS idx_icao24_time ON flights (icao24, collection_time)')
         conn.execute('CREATE INDEX IF NOT EXISTS idx_trajectory ON flights (icao24, trajectory_segment)')
         
-        conn.commit()
-        conn.close()
-        
     def load_daily_stats(self):
         """Load today's API usage"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
         
         today = datetime.now().date().isoformat()
         cursor.execute('SELECT opensky_calls, schiphol_calls, total_calls FROM api_usage WHERE date = ?', (today,))
@@ -195,43 +240,55 @@ class OptimizedFlightCollector:
                 'INSERT INTO api_usage (date, opensky_calls, schiphol_calls, total_calls) VALUES (?, 0, 0, 0)',
                 (today,)
             )
-            conn.commit()
-            
-        conn.close()
-        
-    def update_api_usage(self, opensky: int = 0, schiphol: int = 0):
-        """Update API usage tracking"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         
-        today = datetime.now().date().isoformat()
-        
-        # Reset if new day
-        if datetime.now().date() != self.last_reset_date:
-            self.api_calls_today = 0
-            self.stats['opensky_calls'] = 0
-            self.stats['schiphol_calls'] = 0
-            self.last_reset_date = datetime.now().date()
+    def update_api_usage(self, opensky: int = 0, schiphol: int = 0,
+                         now: Optional[datetime] = None):
+        """Update API usage tracking (in memory; persisted by _flush_usage)"""
+        self._check_day_rollover(now)
             
         # Update counters
         self.stats['opensky_calls'] += opensky
         self.stats['schiphol_calls'] += schiphol
         self.api_calls_today += (opensky + schiphol)
         
-        # Update database
-        cursor.execute('''
-            UPDATE api_usage 
-            SET opensky_calls = opensky_calls + ?,
-                schiphol_calls = schiphol_calls + ?,
-                total_calls = total_calls + ?,
-                collections = collections + 1
-            WHERE date = ?
-        ''', (opensky, schiphol, opensky + schiphol, today))
+        self._pending_usage['opensky'] += opensky
+        self._pending_usage['schiphol'] += schiphol
+        self._pending_usage['collections'] += 1
         
-        conn.commit()
-        conn.close()
+        pending_total = self._pending_usage['opensky'] + self._pending_usage['schiphol']
+        if (pending_total >= self.USAGE_FLUSH_CALLS or
+                time.monotonic() - self._last_usage_flush >= self.USAGE_FLUSH_SECONDS):
+            self._flush_usage()
+            
+    def _check_day_rollover(self, now: Optional[datetime] = None):
+        """Reset the daily API counters when the date changes"""
+        today = (now or datetime.now()).date()
+        if today != self.last_reset_date:
+            self._flush_usage()
+            self.api_calls_today = 0
+            self.stats['opensky_calls'] = 0
+            self.stats['schiphol_calls'] = 0
+            self.last_reset_date = today
+            
+    def _flush_usage(self):
+        """Write pending API usage counters to the database in one statement"""
+        pending = self._pending_usage
+        if pending['collections']:
+            self._conn.execute('''
+                INSERT INTO api_usage (date, opensky_calls, schiphol_calls, total_calls, collections)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(date) DO UPDATE SET
+                    opensky_calls = opensky_calls + excluded.opensky_calls,
+                    schiphol_calls = schiphol_calls + excluded.schiphol_calls,
+                    total_calls = total_calls + excluded.total_calls,
+                    collections = collections + excluded.collections
+            ''', (self.last_reset_date.isoformat(), pending['opensky'], pending['schiphol'],
+                  pending['opensky'] + pending['schiphol'], pending['collections']))
+            
+        self._pending_usage = {'opensky': 0, 'schiphol': 0, 'collections': 0}
+        self._last_usage_flush = time.monotonic()
         
-    def get_current_schedule(self) -> Dict:
+    def get_current_schedule(self, now: Optional[datetime] = None) -> Dict:
         """Get current schedule"""
         if self.api_calls_today >= self.DAILY_API_LIMIT:
             return {
@@ -241,16 +298,9 @@ class OptimizedFlightCollector:
                 'description': 'API limit reached - emergency mode'
             }
             
-        current_hour = datetime.now().hour
-        
-        for schedule_name, schedule in self.collection_settings['schedules'].items():
-            if current_hour in schedule['hours']:
-                return {
-                    'name': schedule_name,
-                    'opensky_interval': schedule['opensky_interval'],
-                    'schiphol_interval': schedule['schiphol_interval'],
-                    'description': schedule['description']
-                }
+        schedule = self._hour_to_schedule[(now or datetime.now()).hour]
+        if schedule is not None:
+            return schedule
                 
         # Fallback
         return {
@@ -260,7 +310,8 @@ class OptimizedFlightCollector:
             'description': 'Fallback schedule'
         }
         
-    def should_call_schiphol(self, flights_detected: int, schedule: Dict) -> bool:
+    def should_call_schiphol(self, flights_detected: int, schedule: Dict,
+                             now: Optional[datetime] = None) -> bool:
         """Smart decision on whether to call Schiphol API"""
         if flights_detected == 0:
             return False
@@ -269,37 +320,69 @@ class OptimizedFlightCollector:
             return True
             
         # Check interval
-        time_since_last = (datetime.now() - self.schiphol_state['last_call']).total_seconds()
+        time_since_last = ((now or datetime.now()) - self.schiphol_state['last_call']).total_seconds()
         return time_since_last >= schedule['schiphol_interval']
         
+    def _cache_put(self, callsign: str, data: Dict):
+        """Insert into the aircraft cache, evicting the least recently seen entry"""
+        aircraft_cache = self.schiphol_state['aircraft_cache']
+        aircraft_cache[callsign] = data
+        aircraft_cache.move_to_end(callsign)
+        if len(aircraft_cache) > self.AIRCRAFT_CACHE_SIZE:
+            aircraft_cache.popitem(last=False)
+            
+    def _fetch_schiphol(self, callsign: str) -> Dict:
+        """Aircraft details for a callsign from the Schiphol API"""
+        # This would call Schiphol API for aircraft details
+        # For now, cache the callsign so it isn't looked up again
+        return {'callsign': callsign, 'fetched_at': datetime.now()}
+        
     def collect_data(self):
         """Optimized data collection"""
-        schedule = self.get_current_schedule()
+        # One clock read per collection; every step sees the same instant
         collection_time = datetime.now()
+        schedule = self.get_current_schedule(collection_time)
         
         try:
             logging.info(f"📡 Collection - {schedule['description']}")
             
             # 1. Always get OpenSky data (our primary source)
             flights_df = self.fetcher.get_current_flights()
-            self.update_api_usage(opensky=1)
+            self.update_api_usage(opensky=1, now=collection_time)
             
             flights_detected = len(flights_df) if not flights_df.empty else 0
             collection_type = 'opensky'
             
             # 2. Smart Schiphol enrichment
             schiphol_data = {}
-            if self.should_call_schiphol(flights_detected, schedule):
+            if self.should_call_schiphol(flights_detected, schedule, collection_time):
                 try:
-                    # Get Schiphol data for detected aircraft
-                    for _, flight in flights_df.iterrows():
-                        if flight['callsign'] and flight['callsign'] not in self.schiphol_state['aircraft_cache']:
-                            # This would call Schiphol API for aircraft details
-                            # For now, we'll simulate with noise calculation
-                            pass
+                    # Get Schiphol data only for callsigns not cached yet
+                    aircraft_cache = self.schiphol_state['aircraft_cache']
+                    callsigns = flights_df['callsign']
+                    has_callsign = callsigns.notna() & (callsigns != '')
+                    seen_callsigns = set(callsigns[has_callsign].unique())
+                    new_callsigns = list(seen_callsigns - aircraft_cache.keys())
+                    
+                    # Refresh recency of cache hits
+                    for callsign in seen_callsigns.intersection(aircraft_cache.keys()):
+                        aircraft_cache.move_to_end(callsign)
+                    
+                    # Stay within today's API budget, one call per callsign, without
+                    # touching the share still reserved for today's OpenSky calls
+                    if self.SCHIPHOL_LIVE:
+                        remaining = max(0, self.DAILY_API_LIMIT - self.api_calls_today)
+                        opensky_reserve = max(0, self.OPENSKY_DAILY_RESERVE - self.stats['opensky_calls'])
+                        new_callsigns = new_callsigns[:max(0, remaining - opensky_reserve)]
+                    
+                    # Lookups are I/O-bound, so run them concurrently
+                    for callsign, data in zip(new_callsigns,
+                                              self._pool.map(self._fetch_schiphol, new_callsigns)):
+                        self._cache_put(callsign, data)
                     
                     self.schiphol_state['last_call'] = collection_time
-                    self.update_api_usage(schiphol=1)
+                    if self.SCHIPHOL_LIVE and new_callsigns:
+                        self.update_api_usage(schiphol=len(new_callsigns), now=collection_time)
                     collection_type = 'combined'
                     
                 except Exception as e:
@@ -307,48 +390,48 @@ class OptimizedFlightCollector:
                     
             # 3. Store flight data
             if not flights_df.empty:
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
+                # Noise impact for the whole batch in one vectorized call
+                distance_km, estimated_db = self.analyzer.calculate_noise_impact_vec(
+                    flights_df['latitude'].to_numpy(dtype=float),
+                    flights_df['longitude'].to_numpy(dtype=float),
+                    flights_df['baro_altitude'].to_numpy(dtype=float),
+                    self.collection_settings['house_coords']
+                )
+                flights_df['distance_km'] = distance_km
+                flights_df['estimated_noise_db'] = estimated_db
                 
-                for _, flight in flights_df.iterrows():
-                    # Calculate noise impact
-                    noise_data = self.analyzer.calculate_noise_impact(
-                        flight['latitude'], flight['longitude'], 
-                        flight.get('baro_altitude', 0)
-                    )
-                    
-                    # Track aircraft
-                    icao24 = flight['icao24']
-                    if icao24 not in self.stats['flights_tracked']:
-                        self.stats['flights_tracked'][icao24] = 0
-                    self.stats['flights_tracked'][icao24] += 1
-                    
-                    # Insert flight record
-                    cursor.execute('''
-                        INSERT INTO flights (
-                            collection_time, collection_type, icao24, callsign,
-                            latitude, longitude, baro_altitude, velocity,
-                            true_track, vertical_rate, distance_to_house_km,
-                            estimated_noise_db, points_in_segment
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        collection_time.isoformat(), collection_type,
-                        flight['icao24'], flight.get('callsign', ''),
-                        flight['latitude'], flight['longitude'],
-                        flight.get('baro_altitude'), flight.get('velocity'),
-                        flight.get('true_track'), flight.get('vertical_rate'),
-                        noise_data['distance_km'], noise_data['estimated_db'],
-                        self.stats['flights_tracked'][icao24]
-                    ))
-                    
-                conn.commit()
-                conn.close()
+                # Track aircraft
+                icao24s = flights_df['icao24'].tolist()
+                flights_tracked = self.stats['flights_tracked']
+                batch_counts = Counter(icao24s)
+                for icao24, n in batch_counts.items():
+                    before = flights_tracked[icao24]
+                    if before < 15 <= before + n:
+                        self._high_quality_count += 1
+                flights_tracked.update(batch_counts)
+                points = [flights_tracked[icao24] for icao24 in icao24s]
+                
+                flights_df['collection_time'] = collection_time.isoformat()
+                flights_df['collection_type'] = collection_type
+                flights_df['points_in_segment'] = points
+                
+                rows = list(flights_df[[
+                    'collection_time', 'collection_type', 'icao24', 'callsign',
+                    'latitude', 'longitude', 'baro_altitude', 'velocity',
+                    'true_track', 'vertical_rate', 'distance_km',
+                    'estimated_noise_db', 'points_in_segment'
+                ]].itertuples(index=False, name=None))
+                
+                # Insert all flight records in one transaction
+                with self._conn:
+                    self._conn.execute('BEGIN')
+                    self._conn.executemany(_INSERT_FLIGHT_SQL, rows)
                 
             self.stats['total_collections'] += 1
             self.stats['last_collection'] = collection_time
             
             # Log progress
-            high_quality = len([k for k, v in self.stats['flights_tracked'].items() if v >= 15])
+            high_quality = self._high_quality_count
             remaining_calls = self.DAILY_API_LIMIT - self.api_calls_today
             
             logging.info(f"✅ Collected {flights_detected} flights | "
@@ -383,27 +466,37 @@ class OptimizedFlightCollector:
         last_opensky = 0
         
         while self.running and datetime.now() < self.end_time:
+            # Day rollover here, not only in collect_data, so a spent budget
+            # is restored at midnight even while collection is paused
+            self._check_day_rollover()
             schedule = self.get_current_schedule()
             current_time = time.time()
             
-            # Check if it's time for OpenSky collection
-            if current_time - last_opensky >= schedule['opensky_interval']:
-                if self.api_calls_today < self.DAILY_API_LIMIT:
-                    self.collect_data()
-                    last_opensky = current_time
-                else:
-                    logging.warning("⚠️ Daily API limit reached, pausing collection")
-                    time.sleep(3600)  # Sleep 1 hour
-                    
-            time.sleep(1)  # Check every second
+            # Sleep exactly until the next OpenSky collection is due; a shutdown
+            # signal sets the event and wakes us immediately. The schedule is
+            # recomputed after waking so hour-boundary changes apply.
+            wait = last_opensky + schedule['opensky_interval'] - current_time
+            if wait > 0:
+                self._stop_event.wait(timeout=wait)
+                continue
+                
+            if self.api_calls_today < self.DAILY_API_LIMIT:
+                self.collect_data()
+                last_opensky = current_time
+            else:
+                logging.warning("⚠️ Daily API limit reached, pausing collection")
+                self._stop_event.wait(timeout=3600)  # Sleep 1 hour
             
         logging.info("Collection completed")
+        self._pool.shutdown(wait=True)
+        self._flush_usage()
         self.print_stats()
         
     def signal_handler(self, signum, frame):
         """Graceful shutdown"""
         logging.info("📛 Shutdown signal received")
         self.running = False
+        self._stop_event.set()
         
     def print_stats(self):
         """Print final statistics"""
@@ -418,7 +511,7 @@ class OptimizedFlightCollector:
         print(f"Aircraft tracked: {len(self.stats['flights_tracked'])}")
         
         # Best tracked aircraft
-        best = sorted(self.stats['flights_tracked'].items(), key=lambda x: x[1], reverse=True)[:10]
+        best = self.stats['flights_tracked'].most_common(10)
         print("\nBest Tracked Aircraft:")
         for icao24, points in best:
             print(f"  {icao24}: {points} points")
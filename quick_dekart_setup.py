@@ -6,6 +6,7 @@ Bypasses ETL pipeline issues to get data into PostgreSQL for immediate visualiza
 
 import sqlite3
 import psycopg2
+from psycopg2.extras import execute_values
 from datetime import datetime
 import json
 
@@ -18,6 +19,41 @@ pg_params = {
     'database': 'aviation_impact_analysis'
 }
 
+# Row template for execute_values: over_house (11th) and is_weekend (17th)
+# arrive from SQLite as 0/1 integers and are cast server-side
+DEKART_ROW_TEMPLATE = (
+    "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::boolean,"
+    " %s, %s, %s, %s, %s, %s::boolean)"
+)
+
+DEKART_INSERT_SQL = """
+    INSERT INTO flight_data.dekart_flights (
+        icao24, callsign, latitude, longitude, altitude,
+        velocity, vertical_rate, collection_time, distance_km,
+        estimated_db, over_house, aircraft_type, origin,
+        destination, airline, collection_hour, is_weekend
+    ) VALUES %s
+"""
+
+def insert_dekart_rows(pg_cursor, rows) -> int:
+    """Insert a batch under a savepoint; on failure bisect to skip only bad rows"""
+    pg_cursor.execute("SAVEPOINT dekart_batch;")
+    try:
+        execute_values(pg_cursor, DEKART_INSERT_SQL, rows,
+                       template=DEKART_ROW_TEMPLATE, page_size=1000)
+        inserted = len(rows)
+    except psycopg2.Error as e:
+        pg_cursor.execute("ROLLBACK TO SAVEPOINT dekart_batch;")
+        if len(rows) == 1:
+            print(f"Error inserting flight: {e}")
+            inserted = 0
+        else:
+            mid = len(rows) // 2
+            inserted = (insert_dekart_rows(pg_cursor, rows[:mid]) +
+                        insert_dekart_rows(pg_cursor, rows[mid:]))
+    pg_cursor.execute("RELEASE SAVEPOINT dekart_batch;")
+    return inserted
+
 def setup_dekart_view():
     """Create a simple view for Dekart visualization"""
     
@@ -49,15 +85,37 @@ def setup_dekart_view():
         );
     """)
     
-    # Clear existing data
+    # Point geometry for spatial filters in Dekart (computed by PostGIS on insert)
+    pg_cursor.execute("""
+        ALTER TABLE flight_data.dekart_flights
+        ADD COLUMN IF NOT EXISTS geom geometry(Point, 4326)
+        GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)) STORED;
+    """)
+    
+    # Clear existing data; drop secondary indexes and WAL-logging for the bulk load
     pg_cursor.execute("TRUNCATE flight_data.dekart_flights;")
+    pg_cursor.execute("DROP INDEX IF EXISTS flight_data.idx_dekart_flights_geom;")
+    pg_cursor.execute("DROP INDEX IF EXISTS flight_data.idx_dekart_flights_time;")
+    pg_cursor.execute("ALTER TABLE flight_data.dekart_flights SET UNLOGGED;")
     
     # Connect to SQLite
     sqlite_conn = sqlite3.connect(sqlite_path)
     sqlite_cursor = sqlite_conn.cursor()
     
+    # Time fields are stored by the enhanced collector; databases it hasn't
+    # migrated yet get them computed from collection_time instead
+    flight_columns = {row[1] for row in sqlite_cursor.execute("PRAGMA table_info(flights)")}
+    time_fields = {
+        'collection_hour': "CAST(strftime('%H', collection_time) AS INTEGER)",
+        'is_weekend': "CASE WHEN strftime('%w', collection_time) IN ('0', '6') THEN 1 ELSE 0 END"
+    }
+    hour_expr, weekend_expr = (
+        column if column in flight_columns else f"{expression} AS {column}"
+        for column, expression in time_fields.items()
+    )
+    
     # Get last 1000 flights for visualization
-    sqlite_cursor.execute("""
+    sqlite_cursor.execute(f"""
         SELECT 
             icao24, callsign, latitude, longitude, baro_altitude,
             velocity, vertical_rate, collection_time, distance_to_house_km,
@@ -67,40 +125,55 @@ def setup_dekart_view():
             SUBSTR(flight_number, 1, 3) as origin,
             runway as destination,
             airline,
-            CAST(strftime('%H', collection_time) as INTEGER) as collection_hour,
-            CASE WHEN strftime('%w', collection_time) IN ('0', '6') THEN 1 ELSE 0 END as is_weekend
+            {hour_expr},
+            {weekend_expr}
         FROM flights
         WHERE latitude IS NOT NULL AND longitude IS NOT NULL
         ORDER BY collection_time DESC
         LIMIT 5000
     """)
     
-    flights = sqlite_cursor.fetchall()
-    print(f"Found {len(flights)} flights to transfer")
-    
-    # Insert into PostgreSQL with proper type conversion
-    for flight in flights:
-        try:
-            # Convert is_weekend from 0/1 to boolean
-            flight_data = list(flight)
-            flight_data[16] = bool(flight_data[16])  # is_weekend
-            flight_data[10] = bool(flight_data[10])  # over_house
-            
-            pg_cursor.execute("""
-                INSERT INTO flight_data.dekart_flights (
-                    icao24, callsign, latitude, longitude, altitude,
-                    velocity, vertical_rate, collection_time, distance_km,
-                    estimated_db, over_house, aircraft_type, origin,
-                    destination, airline, collection_hour, is_weekend
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, flight_data)
-        except Exception as e:
-            print(f"Error inserting flight: {e}")
-            continue
+    # Stream rows from SQLite to PostgreSQL in batches instead of fetchall()
+    sqlite_cursor.arraysize = 1000
+    transferred = 0
     
-    # Create visualization-friendly views
+    while batch := sqlite_cursor.fetchmany():
+        # SQLite rows go through untouched; PostgreSQL casts the 0/1 flags
+        transferred += insert_dekart_rows(pg_cursor, batch)
+    
+    print(f"Transferred {transferred} flights")
+    
+    # Build indexes once over the loaded data rather than maintaining them per row
+    pg_cursor.execute("ALTER TABLE flight_data.dekart_flights SET LOGGED;")
     pg_cursor.execute("""
-        CREATE OR REPLACE VIEW flight_data.noise_heatmap AS
+        CREATE INDEX idx_dekart_flights_geom
+        ON flight_data.dekart_flights USING GIST (geom);
+    """)
+    pg_cursor.execute("""
+        CREATE INDEX idx_dekart_flights_time
+        ON flight_data.dekart_flights (collection_time DESC)
+        INCLUDE (icao24, estimated_db);
+    """)
+    
+    # Aggregate views are materialized so Dekart panels don't re-aggregate on
+    # every render; replace plain views left over from earlier setups first
+    pg_cursor.execute("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_views
+                       WHERE schemaname = 'flight_data' AND viewname = 'noise_heatmap') THEN
+                DROP VIEW flight_data.noise_heatmap;
+            END IF;
+            IF EXISTS (SELECT 1 FROM pg_views
+                       WHERE schemaname = 'flight_data' AND viewname = 'hourly_patterns') THEN
+                DROP VIEW flight_data.hourly_patterns;
+            END IF;
+        END $$;
+    """)
+    
+    pg_cursor.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS flight_data.noise_heatmap
+        WITH (fillfactor=100) AS
         SELECT 
             date_trunc('hour', collection_time) as hour,
             AVG(latitude) as lat,
@@ -112,6 +185,10 @@ def setup_dekart_view():
         WHERE estimated_db > 0
         GROUP BY date_trunc('hour', collection_time);
     """)
+    pg_cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_noise_heatmap_hour
+        ON flight_data.noise_heatmap (hour);
+    """)
     
     pg_cursor.execute("""
         CREATE OR REPLACE VIEW flight_data.flight_paths AS
@@ -136,7 +213,8 @@ def setup_dekart_view():
     """)
     
     pg_cursor.execute("""
-        CREATE OR REPLACE VIEW flight_data.hourly_patterns AS
+        CREATE MATERIALIZED VIEW IF NOT EXISTS flight_data.hourly_patterns
+        WITH (fillfactor=100) AS
         SELECT 
             collection_hour as hour,
             COUNT(*) as flights,
@@ -146,6 +224,14 @@ def setup_dekart_view():
         GROUP BY collection_hour
         ORDER BY collection_hour;
     """)
+    pg_cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_hourly_patterns_hour
+        ON flight_data.hourly_patterns (hour);
+    """)
+    
+    # Recompute the aggregates once per load
+    pg_cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY flight_data.noise_heatmap;")
+    pg_cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY flight_data.hourly_patterns;")
     
     pg_conn.commit()
     print("✅ Dekart tables and views created successfully")
@@ -8,15 +8,207 @@ import sqlite3
 import signal
 import sys
 import time
+import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 import os
 import json
+import shutil
+import subprocess
+import tempfile
+from collections import Counter
+import numpy as np
 
 # Import existing components with CORRECT interfaces
 from opensky_fetcher import OpenSkyFetcher
-from schiphol_analyzer import SchipholFlightAnalyzer
+from schiphol_analyzer import SchipholFlightAnalyzer, NUMBA_AVAILABLE, NUMBA_MIN_ROWS
+
+# Optional: orjson for serializing large insert batches (stdlib json without it)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional: HyperLogLog sketch for the unique aircraft count (exact set without it)
+try:
+    from datasketch import HyperLogLog
+    DATASKETCH_AVAILABLE = True
+except ImportError:
+    DATASKETCH_AVAILABLE = False
+
+# HyperLogLog precision: 2**12 registers, ~1.6% standard error in ~4 KB
+HLL_PRECISION = 12
+
+# Optional: msgpack for the state snapshot (JSON is used without it)
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# Optional: numba JIT kernel for large zone-classification batches (availability and
+# batch threshold shared with the noise kernel in schiphol_analyzer)
+if NUMBA_AVAILABLE:
+    from numba import njit
+    
+    @njit(cache=True)
+    def _classify_kernel(lat, lon, l_box, s_box):
+        """Single-pass zone index per position, see coverage_zone_index"""
+        n = lat.size
+        out = np.empty(n, dtype=np.int8)
+        for i in range(n):
+            in_local = ((lat[i] >= l_box[0]) & (lat[i] <= l_box[1]) &
+                        (lon[i] >= l_box[2]) & (lon[i] <= l_box[3]))
+            in_schiphol = ((lat[i] >= s_box[0]) & (lat[i] <= s_box[1]) &
+                           (lon[i] >= s_box[2]) & (lon[i] <= s_box[3]))
+            out[i] = 0 if in_local else (1 if in_schiphol else 2)
+        return out
+
+# Column order of INSERT_FLIGHT_SQL, used to build the parameter tuples
+INSERT_FLIGHT_COLUMNS = [
+    'collection_time', 'icao24', 'callsign', 'origin_country',
+    'latitude', 'longitude', 'baro_altitude', 'velocity', 'true_track', 'vertical_rate',
+    'area_type', 'distance_to_house_km', 'estimated_noise_db', 'noise_impact_level',
+    'schiphol_operation', 'approach_corridor',
+    'collection_interval_minutes', 'points_for_aircraft', 'coverage_zone',
+    'aircraft_type', 'airline', 'flight_number', 'runway', 'gate', 'aircraft_category',
+    'collection_hour', 'is_weekend'
+]
+
+# Aircraft not seen for this long are evicted from the trajectory counter
+TRAJECTORY_IDLE_SECONDS = 3600
+TRAJECTORY_EVICT_EVERY = 20  # collections between eviction passes
+
+# Collections between state snapshots (stats + trajectory counts, restored on restart)
+STATE_SNAPSHOT_EVERY = 20
+
+# Coverage zones in index order (narrowest first), as produced by determine_coverage_zone
+COVERAGE_ZONES = np.array(['local', 'schiphol', 'extended'])
+
+# Values for analysis columns the pipeline may not produce
+FLIGHT_COLUMN_DEFAULTS = {
+    'callsign': '', 'origin_country': '',
+    'baro_altitude': None, 'velocity': None, 'true_track': None, 'vertical_rate': None,
+    'area_type': 'unknown', 'distance_to_house_km': 0, 'estimated_noise_db': 0,
+    'noise_impact_level': 'low', 'schiphol_operation': '', 'approach_corridor': '',
+    'aircraft_type': '', 'airline': '', 'flight_number': '', 'runway': '',
+    'gate': '', 'aircraft_category': ''
+}
+
+# Time fields added to older databases, with the expression used to backfill them
+TIME_COLUMN_BACKFILL = {
+    'collection_hour': "CAST(strftime('%H', collection_time) AS INTEGER)",
+    'is_weekend': "CASE WHEN strftime('%w', collection_time) IN ('0', '6') THEN 1 ELSE 0 END"
+}
+
+# Analysis-only indexes. With defer_analysis_indexes they are kept out of the table for
+# the whole run (dropped at start, no per-insert maintenance) and built once at shutdown
+DEFERRED_INDEXES = {
+    'idx_trajectory_points': 'CREATE INDEX IF NOT EXISTS idx_trajectory_points ON flights (icao24, points_for_aircraft)',
+    'idx_coverage_zone': 'CREATE INDEX IF NOT EXISTS idx_coverage_zone ON flights (coverage_zone)',
+    'idx_collection_hour': 'CREATE INDEX IF NOT EXISTS idx_collection_hour ON flights (collection_hour)'
+}
+
+# Archive partition, one per calendar day (staged in an attached temp-file database,
+# then VACUUMed to its own file).
+# Low-cardinality text columns are stored as ids into a shared dictionary table; the
+# 'flights' view decodes them so analysis code can read an archive like the live table.
+ARCHIVE_DICT_COLUMNS = ['origin_country', 'airline', 'aircraft_type']
+
+ARCHIVE_SCHEMA_SQL = [
+    '''
+    CREATE TABLE archive.dictionary (
+        id INTEGER PRIMARY KEY,
+        value TEXT UNIQUE NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE archive.flights_archive (
+        icao24 TEXT NOT NULL,
+        collection_time TIMESTAMP NOT NULL,
+        id INTEGER NOT NULL,
+        callsign TEXT,
+        origin_country_id INTEGER REFERENCES dictionary(id),
+        latitude REAL,
+        longitude REAL,
+        baro_altitude REAL,
+        velocity REAL,
+        true_track REAL,
+        vertical_rate REAL,
+        area_type TEXT NOT NULL,
+        distance_to_house_km REAL,
+        estimated_noise_db REAL,
+        noise_impact_level TEXT,
+        schiphol_operation TEXT,
+        approach_corridor TEXT,
+        collection_interval_minutes REAL,
+        points_for_aircraft INTEGER,
+        coverage_zone TEXT,
+        aircraft_type_id INTEGER REFERENCES dictionary(id),
+        airline_id INTEGER REFERENCES dictionary(id),
+        flight_number TEXT,
+        runway TEXT,
+        gate TEXT,
+        aircraft_category TEXT,
+        collection_hour INTEGER,
+        is_weekend INTEGER,
+        PRIMARY KEY (icao24, collection_time, id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE VIEW archive.flights AS
+    SELECT a.id, a.collection_time, a.icao24, a.callsign, oc.value AS origin_country,
+           a.latitude, a.longitude, a.baro_altitude, a.velocity, a.true_track, a.vertical_rate,
+           a.area_type, a.distance_to_house_km, a.estimated_noise_db, a.noise_impact_level,
+           a.schiphol_operation, a.approach_corridor,
+           a.collection_interval_minutes, a.points_for_aircraft, a.coverage_zone,
+           ac.value AS aircraft_type, al.value AS airline, a.flight_number, a.runway, a.gate,
+           a.aircraft_category, a.collection_hour, a.is_weekend
+    FROM flights_archive a
+    LEFT JOIN dictionary oc ON oc.id = a.origin_country_id
+    LEFT JOIN dictionary ac ON ac.id = a.aircraft_type_id
+    LEFT JOIN dictionary al ON al.id = a.airline_id
+    '''
+]
+
+ARCHIVE_INSERT_SQL = '''
+    INSERT INTO archive.flights_archive
+    SELECT f.icao24, f.collection_time, f.id, f.callsign,
+           (SELECT id FROM archive.dictionary WHERE value = f.origin_country),
+           f.latitude, f.longitude, f.baro_altitude, f.velocity, f.true_track, f.vertical_rate,
+           f.area_type, f.distance_to_house_km, f.estimated_noise_db, f.noise_impact_level,
+           f.schiphol_operation, f.approach_corridor,
+           f.collection_interval_minutes, f.points_for_aircraft, f.coverage_zone,
+           (SELECT id FROM archive.dictionary WHERE value = f.aircraft_type),
+           (SELECT id FROM archive.dictionary WHERE value = f.airline),
+           f.flight_number, f.runway, f.gate, f.aircraft_category, f.collection_hour, f.is_weekend
+    FROM main.flights f
+    WHERE f.collection_time >= ? AND f.collection_time < ?
+'''
+
+# Flight INSERT, shared by every collection so SQLite reuses the parsed statement
+INSERT_FLIGHT_SQL = '''
+    INSERT INTO flights (
+        collection_time, icao24, callsign, origin_country,
+        latitude, longitude, baro_altitude, velocity, true_track, vertical_rate,
+        area_type, distance_to_house_km, estimated_noise_db, noise_impact_level,
+        schiphol_operation, approach_corridor,
+        collection_interval_minutes, points_for_aircraft, coverage_zone,
+        aircraft_type, airline, flight_number, runway, gate, aircraft_category,
+        collection_hour, is_weekend
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Same INSERT for large batches: the whole batch is bound once as a JSON array of
+# rows and unpacked by json_each in C, instead of 27 binds per row
+JSON_INSERT_MIN_ROWS = 200
+INSERT_FLIGHT_JSON_SQL = f'''
+    INSERT INTO flights ({', '.join(INSERT_FLIGHT_COLUMNS)})
+    SELECT {', '.join(f"json_extract(value, '$[{i}]')" for i in range(len(INSERT_FLIGHT_COLUMNS)))}
+    FROM json_each(?)
+'''
 
 class SafeEnhancedFlightCollector:
     """Enhanced collector that preserves ALL working method signatures"""
@@ -31,12 +223,31 @@ class SafeEnhancedFlightCollector:
         self.api_calls_today = 0
         self.last_reset_date = datetime.now().date()
         
+        # Token bucket refilling at the daily limit spread over 24h; the burst
+        # capacity lets a restart or quiet spell catch up without front-loading a day
+        self.API_BURST = 60
+        self._token_rate = self.DAILY_API_LIMIT / 86400
+        self._tokens = float(self.API_BURST)
+        self._last_refill = time.monotonic()
+        
+        # Daily usage accumulated in memory, written by _flush_daily once an hour
+        self.DAILY_FLUSH_SECONDS = 3600
+        self._daily_delta = {'api_calls': 0, 'collections': 0, 'flights': 0}
+        self._last_flush = time.monotonic()
+        self._last_archive_date = datetime.now().date()
+        
         # ENHANCED SETTINGS - Compatible with working system
         self.collection_settings = {
             # Preserve original structure but enhance timing
             'peak_interval_minutes': 0.5,    # 30 seconds (was 3 minutes)
             'night_interval_minutes': 5,     # 5 minutes (was 10 minutes)
             
+            # Rows older than this are moved to a daily archive file (None disables)
+            'archive_after_hours': 48,
+            
+            # Build DEFERRED_INDEXES once at shutdown instead of maintaining them on every insert
+            'defer_analysis_indexes': True,
+            
             # Preserve house coordinates (CRITICAL)
             'house_coords': (52.395, 4.915),  # Amsterdam Noord 1032 center
             
@@ -51,10 +262,15 @@ class SafeEnhancedFlightCollector:
             }
         }
         
+        # Bounds as [lat_min, lat_max, lon_min, lon_max] arrays for vectorized zone checks
+        self._local_box = self._bounds_box(self.collection_settings['local_bounds'])
+        self._schiphol_box = self._bounds_box(self.collection_settings['schiphol_bounds'])
+        
         # Initialize components (PRESERVE WORKING PATTERN)
         self.fetcher = None
         self.analyzer = SchipholFlightAnalyzer()
         self.running = False
+        self._stop = None  # asyncio.Event while run_async is active
         
         # Enhanced statistics tracking
         self.stats = {
@@ -62,18 +278,30 @@ class SafeEnhancedFlightCollector:
             'api_calls_made': 0,
             'flights_over_house': 0,
             'high_noise_events': 0,
-            'unique_aircraft_spotted': set(),
+            'unique_aircraft_spotted': HyperLogLog(p=HLL_PRECISION) if DATASKETCH_AVAILABLE else set(),
             'start_time': self.start_time,
             'progress_percentage': 0,
             # New enhanced tracking
-            'trajectory_points': {},  # Track points per aircraft
+            'trajectory_points': Counter(),  # Track points per active aircraft
             'coverage_stats': {'local': 0, 'schiphol': 0, 'extended': 0}
         }
+        self._traj = self.stats['trajectory_points']
+        self._traj_last_seen = {}  # icao24 -> time.time() of its latest collection
+        
+        # Tracks that reached 5 / 15 / 30 points, counted as each threshold is crossed
+        self._n_fair = 0
+        self._n_high_quality = 0
+        self._n_excellent = 0
+        
+        # Snapshot of self.stats that survives restarts
+        base_path = os.path.splitext(self.db_path)[0]
+        self.state_path = f"{base_path}_state.mp" if MSGPACK_AVAILABLE else f"{base_path}_state.json"
         
         # Setup
         self.setup_logging()
         self.setup_database()
         self.load_credentials()
+        self.load_state()
         
         # Graceful shutdown (PRESERVE PATTERN)
         signal.signal(signal.SIGINT, self.signal_handler)
@@ -91,9 +319,23 @@ class SafeEnhancedFlightCollector:
             ]
         )
         
+    def _configure_conn(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        """Apply write-throughput PRAGMAs to a SQLite connection"""
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-64000')  # 64 MB page cache
+        conn.execute('PRAGMA mmap_size=268435456')  # 256 MB memory-mapped reads
+        return conn
+        
     def setup_database(self):
         """ENHANCED database schema - PRESERVES original + adds trajectory fields"""
-        conn = sqlite3.connect(self.db_path)
+        # One persistent connection for the collector's lifetime (autocommit;
+        # batches open their own transaction)
+        self.conn = self._configure_conn(sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False, cached_statements=256
+        ))
+        conn = self.conn
         
         # PRESERVE original schema structure but enhance for trajectories
         conn.execute('''
@@ -129,14 +371,34 @@ class SafeEnhancedFlightCollector:
                 flight_number TEXT,
                 runway TEXT,
                 gate TEXT,
-                aircraft_category TEXT
+                aircraft_category TEXT,
+                
+                -- NEW: Time fields stored at insert (read directly by the Dekart export)
+                collection_hour INTEGER,
+                is_weekend INTEGER
             )
         ''')
         
+        # Add time fields to databases created before they existed, backfilling once
+        # (one transaction, each column checked on its own, so a crash can't leave half a migration)
+        existing_columns = {row[1] for row in conn.execute('PRAGMA table_info(flights)')}
+        missing_columns = {column: expression for column, expression in TIME_COLUMN_BACKFILL.items()
+                           if column not in existing_columns}
+        if missing_columns:
+            with conn:
+                conn.execute('BEGIN')
+                for column, expression in missing_columns.items():
+                    conn.execute(f'ALTER TABLE flights ADD COLUMN {column} INTEGER')
+                    conn.execute(f'UPDATE flights SET {column} = {expression}')
+        
         # Enhanced indexes for trajectory analysis
         conn.execute('CREATE INDEX IF NOT EXISTS idx_icao24_time ON flights (icao24, collection_time)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_trajectory_points ON flights (icao24, points_for_aircraft)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_coverage_zone ON flights (coverage_zone)')
+        if not self.collection_settings['defer_analysis_indexes']:
+            for index_sql in DEFERRED_INDEXES.values():
+                conn.execute(index_sql)
+        
+        # Spatial index: each position as a degenerate box, kept in step with flights by triggers
+        self.setup_spatial_index(conn)
         
         # API usage tracking table
         conn.execute('''
@@ -148,8 +410,201 @@ class SafeEnhancedFlightCollector:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+    def setup_spatial_index(self, conn: sqlite3.Connection):
+        """Create the flights_rtree R*Tree (backfilled once) and its sync triggers"""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'flights_rtree'"
+        ).fetchone()
+        if exists:
+            return
+            
+        try:
+            conn.execute('''
+                CREATE VIRTUAL TABLE flights_rtree USING rtree(
+                    id, min_lat, max_lat, min_lon, max_lon
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            logging.warning(f"SQLite rtree module unavailable, no spatial index: {e}")
+            return
+            
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS flights_rtree_insert AFTER INSERT ON flights
+            WHEN NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+            BEGIN
+                INSERT INTO flights_rtree VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS flights_rtree_delete AFTER DELETE ON flights
+            BEGIN
+                DELETE FROM flights_rtree WHERE id = OLD.id;
+            END
+        ''')
+        conn.execute('''
+            INSERT INTO flights_rtree
+            SELECT id, latitude, latitude, longitude, longitude FROM flights
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        ''')
+        
+    def get_flights_in_bounds(self, bounds: Dict, since: Optional[str] = None) -> List[Tuple]:
+        """Flights inside a bounds dict (lat_min/lat_max/lon_min/lon_max) via the R*Tree"""
+        # The R*Tree stores 32-bit boxes rounded outward, so it is searched for overlap
+        # and positions are then rechecked exactly
+        query = '''
+            SELECT f.* FROM flights_rtree r
+            JOIN flights f ON f.id = r.id
+            WHERE r.max_lat >= :lat_min AND r.min_lat <= :lat_max
+                AND r.max_lon >= :lon_min AND r.min_lon <= :lon_max
+                AND f.latitude BETWEEN :lat_min AND :lat_max
+                AND f.longitude BETWEEN :lon_min AND :lon_max
+        '''
+        params = dict(bounds)
+        if since:
+            query += ' AND f.collection_time >= :since'
+            params['since'] = since
+        return self.conn.execute(query, params).fetchall()
+        
+    def drop_deferred_indexes(self):
+        """Drop analysis-only indexes so batch inserts only maintain idx_icao24_time"""
+        for index_name in DEFERRED_INDEXES:
+            self.conn.execute(f'DROP INDEX IF EXISTS {index_name}')
+            
+    def build_deferred_indexes(self):
+        """Rebuild analysis-only indexes over the accumulated table"""
+        start = time.time()
+        for index_sql in DEFERRED_INDEXES.values():
+            self.conn.execute(index_sql)
+        logging.info(f"🗂️ Rebuilt trajectory indexes in {time.time() - start:.1f}s")
+        
+    def archive_old_flights(self):
+        """Move whole days older than archive_after_hours into per-day compressed archive databases"""
+        hours = self.collection_settings['archive_after_hours']
+        if not hours:
+            return
+        cutoff = datetime.now() - timedelta(hours=hours)
+        
+        first = self.conn.execute('SELECT MIN(collection_time) FROM flights').fetchone()[0]
+        if first is None:
+            return
+            
+        # Only days that lie entirely before the cutoff, so each day is archived once
+        day = datetime.fromisoformat(first).date()
+        while datetime.combine(day + timedelta(days=1), datetime.min.time()) <= cutoff:
+            self._archive_day(day)
+            day += timedelta(days=1)
+            
+    def _archive_day(self, day):
+        """Archive one calendar day of flights to archive_YYYYMMDD.db(.zst) and delete it from flights"""
+        # collection_time is ISO text, so 'YYYY-MM-DD' bounds select exactly that day
+        day_start = day.isoformat()
+        day_end = (day + timedelta(days=1)).isoformat()
+        
+        archive_dir = os.path.dirname(os.path.abspath(self.db_path))
+        archive_path = os.path.join(archive_dir, f"archive_{day:%Y%m%d}.db")
+        if os.path.exists(archive_path) or os.path.exists(archive_path + '.zst'):
+            archive_path = os.path.join(archive_dir, f"archive_{day:%Y%m%d}_{datetime.now():%H%M%S}.db")
+        
+        # Stage on disk rather than in memory so a large backlog day can't exhaust RAM
+        fd, staging_path = tempfile.mkstemp(suffix='.db', dir=archive_dir)
+        os.close(fd)
+        conn = self.conn
+        conn.execute('ATTACH DATABASE ? AS archive', (staging_path,))
+        try:
+            conn.execute('PRAGMA archive.journal_mode=OFF')
+            conn.execute('PRAGMA archive.synchronous=OFF')
+            for statement in ARCHIVE_SCHEMA_SQL:
+                conn.execute(statement)
+            with conn:
+                conn.execute('BEGIN')
+                for column in ARCHIVE_DICT_COLUMNS:
+                    conn.execute(f'''
+                        INSERT OR IGNORE INTO archive.dictionary (value)
+                        SELECT DISTINCT {column} FROM main.flights
+                        WHERE collection_time >= ? AND collection_time < ? AND {column} IS NOT NULL
+                    ''', (day_start, day_end))
+                moved = conn.execute(ARCHIVE_INSERT_SQL, (day_start, day_end)).rowcount
+            
+            # Write the partition to disk before deleting anything from the live table
+            if moved:
+                conn.execute('VACUUM archive INTO ?', (archive_path,))
+        finally:
+            conn.execute('DETACH DATABASE archive')
+            os.remove(staging_path)
+            
+        if not moved:
+            return
+        conn.execute('DELETE FROM flights WHERE collection_time >= ? AND collection_time < ?',
+                     (day_start, day_end))
+        
+        if shutil.which('zstd'):
+            subprocess.run(['zstd', '-q', '--rm', archive_path], check=True)
+            archive_path += '.zst'
+        logging.info(f"🗄️ Archived {moved} flights from {day_start} to {archive_path}")
+        
+    def save_state(self):
+        """Write the running statistics to the state snapshot (atomic replace)"""
+        state = {
+            'total_collections': self.stats['total_collections'],
+            'flights_over_house': self.stats['flights_over_house'],
+            'high_noise_events': self.stats['high_noise_events'],
+            'trajectory_points': dict(self._traj),
+            'trajectory_last_seen': self._traj_last_seen,
+            'n_fair': self._n_fair,
+            'n_high_quality': self._n_high_quality,
+            'n_excellent': self._n_excellent,
+            'coverage_stats': self.stats['coverage_stats']
+        }
+        if DATASKETCH_AVAILABLE:
+            state['unique_aircraft_hll'] = self.stats['unique_aircraft_spotted'].reg.tolist()
+        else:
+            state['unique_aircraft_spotted'] = list(self.stats['unique_aircraft_spotted'])
+        tmp_path = self.state_path + '.tmp'
+        try:
+            if MSGPACK_AVAILABLE:
+                with open(tmp_path, 'wb') as f:
+                    f.write(msgpack.packb(state))
+            else:
+                with open(tmp_path, 'w') as f:
+                    json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            logging.warning(f"Could not save state snapshot: {e}")
+            
+    def load_state(self):
+        """Resume running statistics from the state snapshot, if one exists"""
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            if MSGPACK_AVAILABLE:
+                with open(self.state_path, 'rb') as f:
+                    state = msgpack.unpackb(f.read())
+            else:
+                with open(self.state_path, 'r') as f:
+                    state = json.load(f)
+        except Exception as e:
+            logging.warning(f"Could not load state snapshot: {e}")
+            return
+            
+        for key in ('total_collections', 'flights_over_house', 'high_noise_events'):
+            self.stats[key] += state.get(key, 0)
+        self.update_unique_aircraft(state.get('unique_aircraft_spotted', []))
+        if 'unique_aircraft_hll' in state:
+            if DATASKETCH_AVAILABLE:
+                self.stats['unique_aircraft_spotted'].merge(HyperLogLog(
+                    p=HLL_PRECISION, reg=np.array(state['unique_aircraft_hll'], dtype=np.int8)
+                ))
+            else:
+                logging.warning("Snapshot has a HyperLogLog unique aircraft count but datasketch is not installed")
+        self._traj.update(state.get('trajectory_points', {}))
+        self._traj_last_seen.update(state.get('trajectory_last_seen', {}))
+        self._n_fair += state.get('n_fair', 0)
+        self._n_high_quality += state.get('n_high_quality', 0)
+        self._n_excellent += state.get('n_excellent', 0)
+        for zone, count in state.get('coverage_stats', {}).items():
+            self.stats['coverage_stats'][zone] += count
+        logging.info(f"♻️ Resumed state: {self.stats['total_collections']} collections, "
+                     f"{len(self._traj)} active aircraft")
         
     def load_credentials(self):
         """PRESERVE working credential loading pattern"""
@@ -175,25 +630,39 @@ class SafeEnhancedFlightCollector:
             except Exception as e:
                 logging.error(f"Failed to initialize fetcher: {e}")
                 
-    def determine_coverage_zone(self, lat: float, lon: float) -> str:
-        """Determine which coverage zone a flight falls into"""
-        local_bounds = self.collection_settings['local_bounds']
+    @staticmethod
+    def _bounds_box(bounds: Dict) -> np.ndarray:
+        """Bounds dict as a [lat_min, lat_max, lon_min, lon_max] array"""
+        return np.array([bounds['lat_min'], bounds['lat_max'], bounds['lon_min'], bounds['lon_max']])
         
-        # Check local area (Amsterdam Noord focus)
-        if (local_bounds['lat_min'] <= lat <= local_bounds['lat_max'] and
-            local_bounds['lon_min'] <= lon <= local_bounds['lon_max']):
-            return 'local'
+    def coverage_zone_index(self, lat, lon) -> np.ndarray:
+        """Index into COVERAGE_ZONES for each position (0 local, 1 schiphol, 2 extended)"""
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        if NUMBA_AVAILABLE and lat.ndim == 1 and lat.size > NUMBA_MIN_ROWS:
+            return _classify_kernel(np.ascontiguousarray(lat), np.ascontiguousarray(lon),
+                                    self._local_box, self._schiphol_box)
             
-        # Check if in expanded Schiphol area
-        schiphol_bounds = self.collection_settings['schiphol_bounds']
-        if (schiphol_bounds['lat_min'] <= lat <= schiphol_bounds['lat_max'] and
-            schiphol_bounds['lon_min'] <= lon <= schiphol_bounds['lon_max']):
-            return 'schiphol'
-            
-        return 'extended'
+        L = self._local_box
+        S = self._schiphol_box
+        
+        # Check local area (Amsterdam Noord focus), then the expanded Schiphol area
+        local_mask = (lat >= L[0]) & (lat <= L[1]) & (lon >= L[2]) & (lon <= L[3])
+        schiphol_mask = (lat >= S[0]) & (lat <= S[1]) & (lon >= S[2]) & (lon <= S[3])
+        return np.where(local_mask, 0, np.where(schiphol_mask, 1, 2))
+        
+    def determine_coverage_zone(self, lat, lon):
+        """Determine which coverage zone a flight (or array of flights) falls into"""
+        return COVERAGE_ZONES[self.coverage_zone_index(lat, lon)]
         
     def collect_flight_data(self):
         """ENHANCED collection using PRESERVED method signatures"""
+        fetched = self.fetch_flights()
+        if fetched is not None:
+            self.process_flights(*fetched)
+            
+    def fetch_flights(self) -> Optional[Tuple]:
+        """Fetch one OpenSky snapshot; None if the fetch failed"""
         collection_time = datetime.now()
         
         try:
@@ -201,15 +670,21 @@ class SafeEnhancedFlightCollector:
                 self.initialize_fetcher()
                 
             # PRESERVE working method call: get_current_flights()
-            flights_df = self.fetcher.get_current_flights()
+            return collection_time, self.fetcher.get_current_flights()
+        except Exception as e:
+            logging.error(f"Fetch error: {e}")
+            return None
             
+    def process_flights(self, collection_time: datetime, flights_df):
+        """Analyze and store one fetched snapshot"""
+        try:
             if flights_df.empty:
                 logging.info("No flights found in enhanced coverage area")
                 return
                 
             # Track API calls
-            self.api_calls_today += 1
             self.update_daily_stats(api_calls=1)
+            self.api_calls_today += 1
             
             # PRESERVE working method signature: calculate_noise_impact(df, coords)
             house_coords = self.collection_settings['house_coords']
@@ -218,71 +693,71 @@ class SafeEnhancedFlightCollector:
             # PRESERVE working method: identify_schiphol_operations
             flights_analyzed = self.analyzer.identify_schiphol_operations(flights_with_noise)
             
-            # Enhanced processing: add trajectory tracking
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            # Time fields are the same for every row of this collection
+            collection_hour = collection_time.hour
+            is_weekend = int(collection_time.weekday() >= 5)
             
-            flights_collected = 0
-            for _, flight in flights_analyzed.iterrows():
-                if flight['latitude'] is None or flight['longitude'] is None:
-                    continue
-                    
-                # Track trajectory points per aircraft
-                icao24 = flight['icao24']
-                if icao24 not in self.stats['trajectory_points']:
-                    self.stats['trajectory_points'][icao24] = 0
-                self.stats['trajectory_points'][icao24] += 1
-                
-                # Determine coverage zone
-                coverage_zone = self.determine_coverage_zone(flight['latitude'], flight['longitude'])
-                self.stats['coverage_stats'][coverage_zone] += 1
-                
-                # Enhanced data insertion (PRESERVE original fields + add new ones)
-                cursor.execute('''
-                    INSERT INTO flights (
-                        collection_time, icao24, callsign, origin_country,
-                        latitude, longitude, baro_altitude, velocity, true_track, vertical_rate,
-                        area_type, distance_to_house_km, estimated_noise_db, noise_impact_level,
-                        schiphol_operation, approach_corridor,
-                        collection_interval_minutes, points_for_aircraft, coverage_zone,
-                        aircraft_type, airline, flight_number, runway, gate, aircraft_category
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    collection_time.isoformat(), flight['icao24'], flight.get('callsign', ''),
-                    flight.get('origin_country', ''), flight['latitude'], flight['longitude'],
-                    flight.get('baro_altitude'), flight.get('velocity'), flight.get('true_track'),
-                    flight.get('vertical_rate'), flight.get('area_type', 'unknown'),
-                    flight.get('distance_to_house_km', 0), flight.get('estimated_noise_db', 0),
-                    flight.get('noise_impact_level', 'low'), flight.get('schiphol_operation', ''),
-                    flight.get('approach_corridor', ''),
-                    # Enhanced fields
-                    self.collection_settings['peak_interval_minutes'], 
-                    self.stats['trajectory_points'][icao24], coverage_zone,
-                    flight.get('aircraft_type', ''), flight.get('airline', ''),
-                    flight.get('flight_number', ''), flight.get('runway', ''),
-                    flight.get('gate', ''), flight.get('aircraft_category', '')
-                ))
-                
-                flights_collected += 1
-                
-                # Track enhanced statistics
-                if flight.get('area_type') == 'house':
-                    self.stats['flights_over_house'] += 1
-                    
-                if flight.get('estimated_noise_db', 0) > 65:
-                    self.stats['high_noise_events'] += 1
-                    
-                self.stats['unique_aircraft_spotted'].add(icao24)
+            # Enhanced processing: drop rows without a position, work column-wise
+            df = flights_analyzed.dropna(subset=['latitude', 'longitude']).copy()
+            
+            # Track trajectory points per aircraft (running count per row)
+            self.restore_evicted_trajectories(df['icao24'].unique())
+            df['points_for_aircraft'] = (
+                df['icao24'].map(self._traj).astype(int) +
+                df.groupby('icao24').cumcount() + 1
+            )
+            self._traj.update(df['icao24'])
+            
+            # Each track crosses a quality threshold on exactly one row
+            points = df['points_for_aircraft']
+            self._n_fair += int((points == 5).sum())
+            self._n_high_quality += int((points == 15).sum())
+            self._n_excellent += int((points == 30).sum())
+            self._traj_last_seen.update(dict.fromkeys(df['icao24'].unique(), time.time()))
+            
+            # Determine coverage zone
+            zone_idx = self.coverage_zone_index(df['latitude'].to_numpy(), df['longitude'].to_numpy())
+            df['coverage_zone'] = COVERAGE_ZONES[zone_idx]
+            zone_counts = np.bincount(zone_idx, minlength=len(COVERAGE_ZONES))
+            for zone, count in zip(COVERAGE_ZONES, zone_counts):
+                self.stats['coverage_stats'][zone] += int(count)
+            
+            # Enhanced data rows (PRESERVE original fields + add new ones)
+            for column, default in FLIGHT_COLUMN_DEFAULTS.items():
+                if column not in df.columns:
+                    df[column] = default
+            df['collection_time'] = collection_time.isoformat()
+            df['collection_interval_minutes'] = self.collection_settings['peak_interval_minutes']
+            df['collection_hour'] = collection_hour
+            df['is_weekend'] = is_weekend
+            values = df[INSERT_FLIGHT_COLUMNS].astype(object)
+            values = values.where(values.notna(), None)  # NaN -> NULL for both insert paths
+            rows = list(values.itertuples(index=False, name=None))
+            
+            # Track enhanced statistics
+            self.stats['flights_over_house'] += int((df['area_type'] == 'house').sum())
+            self.stats['high_noise_events'] += int((df['estimated_noise_db'] > 65).sum())
+            self.update_unique_aircraft(df['icao24'].unique())
                 
-            conn.commit()
-            conn.close()
+            # Insert the whole batch in one transaction
+            flights_collected = len(rows)
+            with self.conn:
+                self.conn.execute('BEGIN')
+                if len(rows) >= JSON_INSERT_MIN_ROWS:
+                    self.conn.execute(INSERT_FLIGHT_JSON_SQL, (self._rows_to_json(rows),))
+                else:
+                    self.conn.executemany(INSERT_FLIGHT_SQL, rows)
             
             # Update collection stats
             self.stats['total_collections'] += 1
+            if self.stats['total_collections'] % TRAJECTORY_EVICT_EVERY == 0:
+                self.evict_idle_trajectories()
+            if self.stats['total_collections'] % STATE_SNAPSHOT_EVERY == 0:
+                self.save_state()
             self.update_daily_stats(collections=1, flights=flights_collected)
             
             # Enhanced logging
-            high_quality_tracks = len([k for k, v in self.stats['trajectory_points'].items() if v >= 15])
+            high_quality_tracks = self._n_high_quality
             remaining_api = self.DAILY_API_LIMIT - self.api_calls_today
             
             logging.info(f"✅ Enhanced collection: {flights_collected} flights | "
@@ -295,57 +770,191 @@ class SafeEnhancedFlightCollector:
         except Exception as e:
             logging.error(f"Collection error: {e}")
             
+    @staticmethod
+    def _rows_to_json(rows: List[Tuple]) -> str:
+        """Serialize insert rows as one JSON array for INSERT_FLIGHT_JSON_SQL"""
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(rows).decode()
+        return json.dumps(rows)
+        
+    def update_unique_aircraft(self, icao24s):
+        """Add aircraft to the unique aircraft sketch (or set)"""
+        unique_aircraft = self.stats['unique_aircraft_spotted']
+        if DATASKETCH_AVAILABLE:
+            for icao24 in icao24s:
+                unique_aircraft.update(icao24.encode())
+        else:
+            unique_aircraft.update(icao24s)
+            
+    def unique_aircraft_count(self) -> int:
+        """Unique aircraft seen (HyperLogLog estimate when datasketch is installed)"""
+        unique_aircraft = self.stats['unique_aircraft_spotted']
+        if DATASKETCH_AVAILABLE:
+            return int(round(unique_aircraft.count()))  # len() is the register count
+        return len(unique_aircraft)
+        
+    def evict_idle_trajectories(self):
+        """Drop aircraft not seen for TRAJECTORY_IDLE_SECONDS (restored from the table if they return)"""
+        cutoff = time.time() - TRAJECTORY_IDLE_SECONDS
+        idle = [icao24 for icao24, seen in self._traj_last_seen.items() if seen < cutoff]
+        for icao24 in idle:
+            self._traj.pop(icao24, None)
+            del self._traj_last_seen[icao24]
+        if idle:
+            logging.info(f"🧹 Evicted {len(idle)} idle aircraft, tracking {len(self._traj)} active")
+            
+    def restore_evicted_trajectories(self, icao24s):
+        """Seed point counts for aircraft not in memory from their stored rows, so counts stay cumulative"""
+        missing = [icao24 for icao24 in icao24s if icao24 not in self._traj]
+        # Stay under SQLite's bound-parameter limit; the lookups use idx_icao24_time
+        for i in range(0, len(missing), 500):
+            chunk = missing[i:i + 500]
+            rows = self.conn.execute(f'''
+                SELECT icao24, MAX(points_for_aircraft) FROM flights
+                WHERE icao24 IN ({','.join('?' * len(chunk))})
+                GROUP BY icao24
+            ''', chunk).fetchall()
+            self._traj.update({icao24: points for icao24, points in rows if points})
+            
+    def _take_api_token(self) -> float:
+        """Consume one API token; returns 0, or the seconds to wait if the bucket is empty"""
+        now = time.monotonic()
+        self._tokens = min(self.API_BURST, self._tokens + (now - self._last_refill) * self._token_rate)
+        self._last_refill = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self._token_rate
+        
     def update_daily_stats(self, api_calls: int = 0, collections: int = 0, flights: int = 0):
-        """Update daily statistics tracking"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        today = datetime.now().date().isoformat()
-        cursor.execute('''
-            INSERT OR REPLACE INTO daily_api_usage 
-            (date, api_calls, collections, flights_collected)
-            VALUES (?, 
-                COALESCE((SELECT api_calls FROM daily_api_usage WHERE date = ?), 0) + ?,
-                COALESCE((SELECT collections FROM daily_api_usage WHERE date = ?), 0) + ?,
-                COALESCE((SELECT flights_collected FROM daily_api_usage WHERE date = ?), 0) + ?
-            )
-        ''', (today, today, api_calls, today, collections, today, flights))
+        """Update daily statistics tracking (in memory; persisted by _flush_daily)"""
+        today = datetime.now().date()
         
-        conn.commit()
-        conn.close()
+        # Reset if new day, writing the finished day's counters first
+        if today != self.last_reset_date:
+            self._flush_daily()
+            self.api_calls_today = 0
+            self.last_reset_date = today
+            
+        self._daily_delta['api_calls'] += api_calls
+        self._daily_delta['collections'] += collections
+        self._daily_delta['flights'] += flights
+        
+    def _flush_daily(self):
+        """Write pending daily usage counters to the database in one statement"""
+        delta = self._daily_delta
+        if delta['api_calls'] or delta['collections'] or delta['flights']:
+            self.conn.execute('''
+                INSERT INTO daily_api_usage (date, api_calls, collections, flights_collected)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(date) DO UPDATE SET
+                    api_calls = api_calls + excluded.api_calls,
+                    collections = collections + excluded.collections,
+                    flights_collected = flights_collected + excluded.flights_collected
+            ''', (self.last_reset_date.isoformat(), delta['api_calls'], delta['collections'], delta['flights']))
+            
+        self._daily_delta = {'api_calls': 0, 'collections': 0, 'flights': 0}
+        self._last_flush = time.monotonic()
         
     def run(self):
         """ENHANCED run loop with preserved working patterns"""
+        asyncio.run(self.run_async())
+        
+    async def run_async(self):
+        """Collection loop: a fetch task feeds a single-slot queue that is drained here"""
         logging.info(f"🚀 Safe Enhanced Flight Collector starting")
         logging.info(f"📊 Enhanced 30-second collection intervals during peak hours")
         logging.info(f"🎯 Expanded coverage area: {self.collection_settings['schiphol_bounds']}")
         logging.info(f"🏠 House monitoring: {self.collection_settings['house_coords']}")
         
         self.running = True
+        self._stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.request_stop)
+        
+        # Only idx_icao24_time is maintained while collecting
+        defer_indexes = self.collection_settings['defer_analysis_indexes']
+        if defer_indexes:
+            self.drop_deferred_indexes()
         
-        # Main collection loop with enhanced timing
-        while self.running and datetime.now() < self.end_time:
-            current_hour = datetime.now().hour
+        # The next fetch overlaps analysis and insert of the current snapshot; the
+        # blocking HTTP and SQLite work runs in worker threads so the loop stays free
+        batches = asyncio.Queue(maxsize=1)
+        fetch_task = asyncio.create_task(self._fetch_loop(batches))
+        
+        while (batch := await batches.get()) is not None:
+            await asyncio.to_thread(self.process_flights, *batch)
+            
+            if time.monotonic() - self._last_flush > self.DAILY_FLUSH_SECONDS:
+                self._flush_daily()
+                
+            # Nightly archive of rows that have left the live window
+            if datetime.now().date() != self._last_archive_date:
+                self._last_archive_date = datetime.now().date()
+                try:
+                    await asyncio.to_thread(self.archive_old_flights)
+                except Exception as e:
+                    logging.error(f"Archive error: {e}")
+                    
+        await fetch_task
+        logging.info("Enhanced collection completed")
+        self._flush_daily()
+        self.save_state()
+        if defer_indexes:
+            self.build_deferred_indexes()
+        self.print_final_stats()
+        self.conn.close()
+        
+    async def _fetch_loop(self, batches: asyncio.Queue):
+        """Fetch on schedule and queue snapshots; None marks the end"""
+        # Ticks are scheduled on the monotonic clock so fetch latency
+        # doesn't push later collections back
+        next_tick = time.monotonic()
+        try:
+            while self.running and datetime.now() < self.end_time:
+                current_hour = datetime.now().hour
             
-            # Enhanced scheduling - more frequent during peak hours
-            if 6 <= current_hour <= 20:  # Peak hours
-                interval_minutes = self.collection_settings['peak_interval_minutes']  # 0.5 = 30 seconds
-            else:  # Night hours
-                interval_minutes = self.collection_settings['night_interval_minutes']  # 5 minutes
+                # Enhanced scheduling - more frequent during peak hours
+                if 6 <= current_hour <= 20:  # Peak hours
+                    interval_minutes = self.collection_settings['peak_interval_minutes']  # 0.5 = 30 seconds
+                else:  # Night hours
+                    interval_minutes = self.collection_settings['night_interval_minutes']  # 5 minutes
                 
-            # Check API limits
-            if self.api_calls_today >= self.DAILY_API_LIMIT:
-                logging.warning("⚠️ Daily API limit reached, switching to night interval")
-                interval_minutes = 10  # Slow down if hitting limits
+                # Check API limits: wait exactly until the next token is available
+                token_wait = self._take_api_token()
+                if token_wait > 0:
+                    logging.warning(f"⚠️ API rate budget exhausted, waiting {token_wait:.0f}s")
+                    await self._wait_or_stop(token_wait)
+                    next_tick = time.monotonic()
+                    continue
                 
-            # Collect data
-            self.collect_flight_data()
+                # Collect data (waits while the previous snapshot is still queued)
+                fetched = await asyncio.to_thread(self.fetch_flights)
+                if fetched is not None:
+                    await batches.put(fetched)
             
-            # Wait for next collection
-            time.sleep(interval_minutes * 60)
+                # Wait for next collection; after an overrun, skip the missed ticks
+                next_tick += interval_minutes * 60
+                now = time.monotonic()
+                if next_tick < now:
+                    next_tick = now
+                await self._wait_or_stop(next_tick - now)
+        finally:
+            await batches.put(None)
             
-        logging.info("Enhanced collection completed")
-        self.print_final_stats()
+    async def _wait_or_stop(self, timeout: float):
+        """Sleep for up to timeout seconds, returning early on shutdown"""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+            
+    def request_stop(self):
+        """Shutdown signal handler on the event loop"""
+        logging.info("📛 Shutdown signal received")
+        self.running = False
+        self._stop.set()
         
     def signal_handler(self, signum, frame):
         """PRESERVE working signal handling"""
@@ -362,13 +971,13 @@ class SafeEnhancedFlightCollector:
         print(f"API calls made: {self.api_calls_today}")
         print(f"Flights over house: {self.stats['flights_over_house']}")
         print(f"High noise events: {self.stats['high_noise_events']}")
-        print(f"Unique aircraft: {len(self.stats['unique_aircraft_spotted'])}")
+        print(f"Unique aircraft: {self.unique_aircraft_count()}")
         
         # Enhanced trajectory statistics
         print(f"\n=== TRAJECTORY QUALITY ===")
-        excellent_tracks = len([k for k, v in self.stats['trajectory_points'].items() if v >= 30])
-        good_tracks = len([k for k, v in self.stats['trajectory_points'].items() if v >= 15])
-        fair_tracks = len([k for k, v in self.stats['trajectory_points'].items() if v >= 5])
+        excellent_tracks = self._n_excellent
+        good_tracks = self._n_high_quality
+        fair_tracks = self._n_fair
         
         print(f"Excellent trajectories (30+ points): {excellent_tracks}")
         print(f"Good trajectories (15+ points): {good_tracks}")
@@ -10,6 +10,46 @@ import json
 from geopy.distance import geodesic
 import math
 
+# Optional: numba JIT kernel for large noise batches
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Below this many rows the JIT dispatch isn't worth it; numpy path is used
+NUMBA_MIN_ROWS = 200
+
+if NUMBA_AVAILABLE:
+    # fastmath without 'nnan'/'ninf' so the missing-position checks survive, and without
+    # 'arcp' so round(x, 1) keeps its exact divide and matches the numpy path
+    @njit(parallel=True, fastmath={'nsz', 'contract', 'afn', 'reassoc'}, cache=True)
+    def _noise_kernel(lat, lon, alt, lat0, lon0):
+        """Scalar-loop haversine distance + noise model, see calculate_noise_impact_vec"""
+        n = lat.size
+        out_d = np.empty(n)
+        out_db = np.empty(n)
+        rlat0 = math.radians(lat0)
+        rlon0 = math.radians(lon0)
+        cos_lat0 = math.cos(rlat0)
+        for i in prange(n):
+            rlat = math.radians(lat[i])
+            a = (math.sin((rlat0 - rlat) / 2) ** 2 +
+                 math.cos(rlat) * cos_lat0 * math.sin((rlon0 - math.radians(lon[i])) / 2) ** 2)
+            d = 6371.0088 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+            if math.isnan(d):
+                out_d[i] = math.inf
+                out_db[i] = 0.0
+                continue
+            out_d[i] = d
+            if math.isnan(alt[i]):
+                out_db[i] = 0.0
+                continue
+            altitude_reduction = min(max(alt[i], 100.0) / 1000 * 5, 40.0)
+            distance_reduction = min(max(d, 0.1) * 2, 20.0)
+            out_db[i] = round(max(80 - altitude_reduction - distance_reduction, 30.0), 1)
+        return out_d, out_db
+
 
 class SchipholFlightAnalyzer:
     """Analyze flights specifically for Schiphol airport operations and local impact"""
@@ -168,9 +208,46 @@ class SchipholFlightAnalyzer:
                 return 'Minimal Impact'
         
         df['noise_impact'] = df['estimated_noise_db'].apply(noise_impact_level)
-        
+
         return df
-    
+
+    def calculate_noise_impact_vec(self, lat: np.ndarray, lon: np.ndarray, alt: np.ndarray,
+                                   target_coords: Tuple[float, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized distance and noise estimate, same model as calculate_noise_impact
+
+        Args:
+            lat: Array of flight latitudes
+            lon: Array of flight longitudes
+            alt: Array of barometric altitudes
+            target_coords: (lat, lon) of target location
+
+        Returns:
+            Tuple of (distance_km, estimated_db) arrays
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        alt = np.asarray(alt, dtype=float)
+
+        if NUMBA_AVAILABLE and lat.size > NUMBA_MIN_ROWS:
+            return _noise_kernel(lat, lon, alt, float(target_coords[0]), float(target_coords[1]))
+
+        # Haversine distance to target location
+        lat1, lon1 = np.radians(lat), np.radians(lon)
+        lat2, lon2 = np.radians(target_coords[0]), np.radians(target_coords[1])
+        a = (np.sin((lat2 - lat1) / 2) ** 2 +
+             np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+        distance_km = 6371.0088 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        distance_km = np.where(np.isnan(distance_km), np.inf, distance_km)
+
+        # Same simplified model: 5dB per 1000ft altitude (max 40), 2dB per km (max 20)
+        altitude_reduction = np.minimum(np.maximum(alt, 100) / 1000 * 5, 40)
+        distance_reduction = np.minimum(np.maximum(distance_km, 0.1) * 2, 20)
+        estimated_db = np.round(np.maximum(80 - altitude_reduction - distance_reduction, 30), 1)
+        estimated_db = np.where(np.isnan(alt) | np.isinf(distance_km), 0.0, estimated_db)
+
+        return distance_km, estimated_db
+
     def identify_schiphol_operations(self, flight_data: pd.DataFrame) -> pd.DataFrame:
         """
         Identify flights that are likely Schiphol arrivals or departures
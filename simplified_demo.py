@@ -6,12 +6,21 @@ Testing core functionality without complex database dependencies
 
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Headless run, figures go straight to PNG
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime, timedelta
 import sqlite3
 import os
 
+# Optional: connectorx reads SQLite results straight into columns (pandas fallback)
+try:
+    import connectorx as cx
+    CONNECTORX_AVAILABLE = True
+except ImportError:
+    CONNECTORX_AVAILABLE = False
+
 def test_maq_integration():
     """Test MAQ weather integration"""
     print("🌤️ Testing MAQ Weather Integration...")
@@ -47,9 +56,8 @@ def test_flight_data_loading():
     for db_path in available_dbs:
         if os.path.exists(db_path):
             try:
-                conn = sqlite3.connect(db_path)
-                
-                # Simplified query without aircraft_tracks table
+                # Simplified query without aircraft_tracks table; the time bound is a
+                # constant in the stored ISO format so the range uses the time index
                 query = """
                     SELECT 
                         collection_time,
@@ -65,13 +73,17 @@ def test_flight_data_loading():
                     FROM flights
                     WHERE latitude IS NOT NULL 
                         AND longitude IS NOT NULL
-                        AND collection_time > datetime('now', '-24 hours')
+                        AND collection_time > strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime', '-24 hours')
                     ORDER BY collection_time
                     LIMIT 100
                 """
                 
-                flight_df = pd.read_sql_query(query, conn)
-                conn.close()
+                if CONNECTORX_AVAILABLE:
+                    flight_df = cx.read_sql(f"sqlite://{os.path.abspath(db_path)}", query, return_type="pandas")
+                else:
+                    conn = sqlite3.connect(db_path)
+                    flight_df = pd.read_sql_query(query, conn)
+                    conn.close()
                 
                 print(f"✅ Loaded {len(flight_df)} flights from {db_path}")
                 print(f"   - Unique aircraft: {flight_df['icao24'].nunique()}")
@@ -186,8 +198,8 @@ def create_demonstration_visualizations():
                 f'{pct}%', ha='center', va='bottom', fontweight='bold')
     
     plt.tight_layout()
-    plt.savefig('hackathon_demonstration_overview.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    fig.savefig('hackathon_demonstration_overview.png', dpi=150, bbox_inches='tight')
+    plt.close(fig)
     
     print("✅ Created hackathon_demonstration_overview.png")
     
@@ -244,8 +256,8 @@ Dutch Mobility Hackathon 2025
     ax.axis('off')
     
     plt.tight_layout()
-    plt.savefig('hackathon_key_insights.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    fig.savefig('hackathon_key_insights.png', dpi=150, bbox_inches='tight')
+    plt.close(fig)
     
     print("✅ Created hackathon_key_insights.png")
 